@@ -2,15 +2,22 @@
 SIGMA REST API
 API endpoints for querying sensor data, fruits, and history
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Callable, List, Optional
 from pydantic import BaseModel
+import orjson
+import threading
+import time
+import config
 import database
 import detection
 
+# Handlers are plain functions on purpose: SQLAlchemy sessions block,
+# so FastAPI runs them in its threadpool instead of on the event loop
 router = APIRouter(prefix="/api")
 
 # Pydantic models for API responses
@@ -46,27 +53,68 @@ class StatsResponse(BaseModel):
     warning_count: int
     rotten_count: int
 
+# Short-lived cache of serialized dashboard responses: key -> (expires_at, body)
+_response_cache: dict[str, tuple[float, bytes]] = {}
+# Bumped on every clear, so bodies built from pre-clear data are not stored
+_cache_generation = 0
+_cache_lock = threading.Lock()
+
+def cached_response(key: str, build: Callable[[], object]) -> Response:
+    """
+    Return the cached JSON body for key, rebuilding it once the TTL expires
+    A new Response is created per request since middleware mutates headers
+    """
+    now = time.monotonic()
+    entry = _response_cache.get(key)
+    if entry is not None and entry[0] > now:
+        return Response(content=entry[1], media_type="application/json")
+    
+    generation = _cache_generation
+    body = orjson.dumps(build())
+    # Only cache if no new data was saved while building; otherwise the
+    # stale body would be served until the TTL expires
+    with _cache_lock:
+        if generation == _cache_generation:
+            _response_cache[key] = (now + config.API_CACHE_TTL, body)
+    return Response(content=body, media_type="application/json")
+
+def clear_response_cache():
+    """Drop cached responses, e.g. after new sensor data is saved"""
+    global _cache_generation
+    with _cache_lock:
+        _cache_generation += 1
+        _response_cache.clear()
+
 @router.get("/fruits", response_model=List[FruitResponse])
-async def get_all_fruits(db: Session = Depends(database.get_db)):
+def get_all_fruits(db: Session = Depends(database.get_db)):
     """Get all monitored fruits with their current status"""
-    fruits = db.query(database.Fruit).all()
+    return cached_response("fruits", lambda: _query_all_fruits(db))
+
+def _query_all_fruits(db: Session) -> list[dict]:
+    """Query all fruits and attach their status color"""
+    # Only fetch the columns the response needs, skipping ORM hydration
+    fruits = db.query(
+        database.Fruit.fruit_id,
+        database.Fruit.fruit_type,
+        database.Fruit.current_status,
+        database.Fruit.last_seen
+    ).all()
     
     # Add status color to response
-    result = []
-    for fruit in fruits:
-        fruit_dict = {
+    status_colors = detection.STATUS_COLORS
+    return [
+        {
             "fruit_id": fruit.fruit_id,
             "fruit_type": fruit.fruit_type,
             "current_status": fruit.current_status,
             "last_seen": fruit.last_seen,
-            "status_color": detection.get_status_color(fruit.current_status)
+            "status_color": status_colors.get(fruit.current_status, detection.DEFAULT_STATUS_COLOR)
         }
-        result.append(fruit_dict)
-    
-    return result
+        for fruit in fruits
+    ]
 
 @router.get("/fruits/{fruit_id}", response_model=FruitResponse)
-async def get_fruit(fruit_id: str, db: Session = Depends(database.get_db)):
+def get_fruit(fruit_id: str, db: Session = Depends(database.get_db)):
     """Get specific fruit details"""
     fruit = db.query(database.Fruit).filter(database.Fruit.fruit_id == fruit_id).first()
     
@@ -82,26 +130,23 @@ async def get_fruit(fruit_id: str, db: Session = Depends(database.get_db)):
     }
 
 @router.get("/sensors/latest", response_model=List[SensorReadingResponse])
-async def get_latest_sensors(db: Session = Depends(database.get_db)):
+def get_latest_sensors(db: Session = Depends(database.get_db)):
     """Get the latest sensor reading for each fruit"""
-    # Subquery to get max timestamp for each fruit
+    # Readings are inserted in arrival order, so the highest id per fruit
+    # is its latest reading; this avoids joining back on (fruit_id, timestamp)
     from sqlalchemy import func
     subq = db.query(
-        database.SensorReading.fruit_id,
-        func.max(database.SensorReading.timestamp).label('max_timestamp')
-    ).group_by(database.SensorReading.fruit_id).subquery()
+        func.max(database.SensorReading.id)
+    ).group_by(database.SensorReading.fruit_id).scalar_subquery()
     
-    # Join to get full records
-    latest_readings = db.query(database.SensorReading).join(
-        subq,
-        (database.SensorReading.fruit_id == subq.c.fruit_id) &
-        (database.SensorReading.timestamp == subq.c.max_timestamp)
+    latest_readings = db.query(database.SensorReading).filter(
+        database.SensorReading.id.in_(subq)
     ).all()
     
     return latest_readings
 
 @router.get("/sensors/history", response_model=List[SensorReadingResponse])
-async def get_sensor_history(
+def get_sensor_history(
     fruit_id: Optional[str] = Query(None, description="Filter by fruit ID"),
     hours: int = Query(24, description="Number of hours to look back"),
     limit: int = Query(100, description="Maximum number of records"),
@@ -111,8 +156,11 @@ async def get_sensor_history(
     # Calculate time threshold
     time_threshold = datetime.utcnow() - timedelta(hours=hours)
     
-    # Build query
-    query = db.query(database.SensorReading).filter(
+    # Build query, selecting only the columns exposed by the response model
+    response_columns = [
+        getattr(database.SensorReading, name) for name in SensorReadingResponse.model_fields
+    ]
+    query = db.query(*response_columns).filter(
         database.SensorReading.timestamp >= time_threshold
     )
     
@@ -123,33 +171,33 @@ async def get_sensor_history(
     # Order by timestamp descending and limit
     readings = query.order_by(desc(database.SensorReading.timestamp)).limit(limit).all()
     
-    return readings
+    # Rows already match SensorReadingResponse, so serialize them directly
+    # instead of having FastAPI validate every field of every row
+    return ORJSONResponse([reading._asdict() for reading in readings])
 
 @router.get("/stats", response_model=StatsResponse)
-async def get_stats(db: Session = Depends(database.get_db)):
+def get_stats(db: Session = Depends(database.get_db)):
     """Get system statistics"""
+    return cached_response("stats", lambda: _query_stats(db))
+
+def _query_stats(db: Session) -> dict:
+    """Query reading and per-status fruit counts"""
     from sqlalchemy import func
     
     total_readings = db.query(func.count(database.SensorReading.id)).scalar()
-    active_fruits = db.query(func.count(database.Fruit.fruit_id)).scalar()
-    
-    # Count by status
-    fresh_count = db.query(func.count(database.Fruit.fruit_id)).filter(
-        database.Fruit.current_status == "fresh"
-    ).scalar()
     
-    warning_count = db.query(func.count(database.Fruit.fruit_id)).filter(
-        database.Fruit.current_status == "warning"
-    ).scalar()
-    
-    rotten_count = db.query(func.count(database.Fruit.fruit_id)).filter(
-        database.Fruit.current_status == "rotten"
-    ).scalar()
+    # Count fruits by status in a single grouped query
+    status_counts = dict(
+        db.query(database.Fruit.current_status, func.count(database.Fruit.fruit_id))
+        .group_by(database.Fruit.current_status)
+        .all()
+    )
+    active_fruits = sum(status_counts.values())
     
     return {
         "total_readings": total_readings or 0,
-        "active_fruits": active_fruits or 0,
-        "fresh_count": fresh_count or 0,
-        "warning_count": warning_count or 0,
-        "rotten_count": rotten_count or 0
+        "active_fruits": active_fruits,
+        "fresh_count": status_counts.get("fresh", 0),
+        "warning_count": status_counts.get("warning", 0),
+        "rotten_count": status_counts.get("rotten", 0)
     }
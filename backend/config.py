@@ -7,6 +7,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Logging Configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()  # DEBUG also logs every MQTT message
+
 # MQTT Configuration
 MQTT_BROKER = os.getenv("MQTT_BROKER", "test.mosquitto.org")
 MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
@@ -14,6 +17,11 @@ MQTT_TOPICS = ["sigma/#"]  # Subscribe to all SIGMA topics
 
 # Database Configuration
 DATABASE_URL = "sqlite:///./sigma.db"
+DB_OPTIMIZE_INTERVAL = 3600  # seconds between planner statistics refreshes
+
+# Ingest Configuration
+INGEST_FLUSH_INTERVAL = 0.5  # seconds between batched database writes
+INGEST_BATCH_SIZE = 200  # buffered messages that trigger an early write
 
 # Detection Rules - RGB thresholds for different fruit types
 DETECTION_RULES = {
@@ -36,8 +44,12 @@ DETECTION_RULES = {
     }
 }
 
+# API Configuration
+API_CACHE_TTL = 2  # seconds to reuse /api/fruits and /api/stats responses
+
 # WebSocket Configuration
 WS_HEARTBEAT_INTERVAL = 30  # seconds
+WS_SEND_TIMEOUT = 5  # seconds before a client that stopped reading is dropped
 
 # CORS Origins
 CORS_ORIGINS = [
@@ -1,21 +1,31 @@
 """
 SIGMA Database Models
-SQLAlchemy models for sensor readings, fruits, and detection logs
+SQLAlchemy models for sensor readings and fruits
 """
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime
+from sqlalchemy import create_engine, event, desc, inspect, Column, Integer, Float, String, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+import logging
+import sqlite3
 import config
 
+logger = logging.getLogger("sigma.database")
+
 Base = declarative_base()
 
 class SensorReading(Base):
     """Store all sensor readings from ESP32"""
     __tablename__ = "sensor_readings"
+    __table_args__ = (
+        # Serves per-fruit history (filter + order by time) and latest-per-fruit lookups
+        Index("ix_sensor_fruit_ts", "fruit_id", desc("timestamp")),
+        # Serves history across all fruits (newest first, stops at LIMIT)
+        Index("ix_readings_ts_desc", desc("timestamp")),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    fruit_id = Column(String, index=True)
+    fruit_id = Column(String)
     fruit_type = Column(String)
     r = Column(Integer)  # Red value (0-255)
     g = Column(Integer)  # Green value (0-255)
@@ -23,34 +33,81 @@ class SensorReading(Base):
     temperature = Column(Float, nullable=True)
     humidity = Column(Float, nullable=True)
     status = Column(String)  # fresh, warning, rotten
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    confidence = Column(Float, nullable=True)  # Detection confidence, 0.0 to 1.0
+    timestamp = Column(DateTime, default=datetime.utcnow)
 
 class Fruit(Base):
     """Track individual fruits being monitored"""
     __tablename__ = "fruits"
+    __table_args__ = (
+        # Serves the per-status counts in /api/stats
+        Index("ix_fruit_status", "current_status"),
+    )
     
     fruit_id = Column(String, primary_key=True)
     fruit_type = Column(String)
     current_status = Column(String)  # fresh, warning, rotten
     last_seen = Column(DateTime, default=datetime.utcnow)
 
-class DetectionLog(Base):
-    """Log detection events for analysis"""
-    __tablename__ = "detection_logs"
-    
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    fruit_id = Column(String, index=True)
-    detection_time = Column(DateTime, default=datetime.utcnow)
-    status = Column(String)
-    confidence = Column(Float)  # 0.0 to 1.0
-
 # Database setup
 engine = create_engine(config.DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Tune SQLite for concurrent dashboard reads alongside MQTT writes"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+        cursor.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, fewer fsyncs per commit
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        cursor.execute("PRAGMA cache_size=-65536")  # 64 MB
+        cursor.close()
+    
+    @event.listens_for(engine, "close")
+    def _optimize_on_close(dbapi_connection, connection_record):
+        """Let SQLite refresh stale planner statistics before closing"""
+        # SQLAlchemy runs this outside its own error handling, so an error
+        # here (e.g. the database is locked) would leave the connection open
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA optimize")
+            cursor.close()
+        except sqlite3.Error as e:
+            logger.warning("⚠️ PRAGMA optimize on close failed: %s", e)
+
 def init_db():
-    """Initialize database tables"""
+    """Initialize database tables and indexes"""
     Base.metadata.create_all(bind=engine)
+    
+    # create_all skips tables that already exist, so add any indexes
+    # introduced after the database file was first created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    
+    with engine.begin() as conn:
+        # Detection confidence used to live in a separate detection_logs table
+        reading_columns = {column["name"] for column in inspect(conn).get_columns("sensor_readings")}
+        if "confidence" not in reading_columns:
+            conn.exec_driver_sql("ALTER TABLE sensor_readings ADD COLUMN confidence FLOAT")
+        
+        # Superseded by ix_sensor_fruit_ts and ix_readings_ts_desc
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_sensor_readings_fruit_id")
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_sensor_readings_timestamp")
+        # Refresh planner statistics so SQLite picks up the indexes
+        conn.exec_driver_sql("ANALYZE")
+
+def optimize_db():
+    """
+    Refresh planner statistics as tables grow
+    PRAGMA optimize only re-analyzes tables whose statistics are stale
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA optimize")
 
 def get_db():
     """Get database session"""
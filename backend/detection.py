@@ -2,8 +2,19 @@
 SIGMA Detection Engine
 Rule-based fruit freshness detection using color sensor data
 """
+from typing import Callable
 import config
 
+RGB_CONDITION_KEYS = {"r_min", "r_max", "g_min", "g_max", "b_min", "b_max"}
+
+# Hex color codes for status visualization
+STATUS_COLORS = {
+    "fresh": "#4ade80",      # Green
+    "warning": "#fb923c",    # Orange
+    "rotten": "#ef4444"      # Red
+}
+DEFAULT_STATUS_COLOR = "#6b7280"  # Gray
+
 def detect_freshness(fruit_type: str, r: int, g: int, b: int, temperature: float = None) -> tuple[str, float]:
     """
     Detect fruit freshness based on RGB values and optional temperature
@@ -17,57 +28,54 @@ def detect_freshness(fruit_type: str, r: int, g: int, b: int, temperature: float
         tuple: (status, confidence) where status is 'fresh', 'warning', or 'rotten'
                and confidence is a float between 0.0 and 1.0
     """
-    # Get rules for this fruit type, fallback to default
-    rules = config.DETECTION_RULES.get(fruit_type.lower(), config.DETECTION_RULES["default"])
+    # Get compiled rules for this fruit type, fallback to default
+    rules = COMPILED_RULES.get(fruit_type.lower(), COMPILED_RULES["default"])
     
     # Check fresh conditions
-    fresh_rules = rules.get("fresh", {})
-    if check_rgb_conditions(r, g, b, fresh_rules):
+    fresh_check, fresh_rules = rules["fresh"]
+    if fresh_check(r, g, b):
         confidence = calculate_confidence(r, g, b, fresh_rules)
         return "fresh", confidence
     
     # Check warning conditions
-    warning_rules = rules.get("warning", {})
-    if check_rgb_conditions(r, g, b, warning_rules):
+    warning_check, warning_rules = rules["warning"]
+    if warning_check(r, g, b):
         confidence = calculate_confidence(r, g, b, warning_rules) * 0.7  # Lower confidence for warning
         return "warning", confidence
     
     # If neither fresh nor warning, it's rotten
     return "rotten", 0.8
 
-def check_rgb_conditions(r: int, g: int, b: int, conditions: dict) -> bool:
+def compile_rgb_conditions(conditions: dict) -> Callable[[int, int, int], bool]:
     """
-    Check if RGB values meet all conditions in the rule
+    Compile a rule into a checker that is True when all of its bounds hold
+    (r_min <= r <= r_max, etc.); a rule with no RGB bounds never matches
+    
+    Missing bounds are replaced by infinities so the checker is a fixed
+    set of chained comparisons with no dictionary lookups per reading
     
     Args:
-        r, g, b: RGB values
         conditions: Dictionary of conditions (r_min, r_max, g_min, etc.)
     
     Returns:
-        bool: True if all conditions are met
+        Callable: check(r, g, b) -> bool
     """
-    checks = []
+    # A rule without any RGB condition never matches
+    if not conditions.keys() & RGB_CONDITION_KEYS:
+        return lambda r, g, b: False
     
-    # Red channel checks
-    if "r_min" in conditions:
-        checks.append(r >= conditions["r_min"])
-    if "r_max" in conditions:
-        checks.append(r <= conditions["r_max"])
+    inf = float("inf")
+    r_min = conditions.get("r_min", -inf)
+    r_max = conditions.get("r_max", inf)
+    g_min = conditions.get("g_min", -inf)
+    g_max = conditions.get("g_max", inf)
+    b_min = conditions.get("b_min", -inf)
+    b_max = conditions.get("b_max", inf)
     
-    # Green channel checks
-    if "g_min" in conditions:
-        checks.append(g >= conditions["g_min"])
-    if "g_max" in conditions:
-        checks.append(g <= conditions["g_max"])
+    def check(r: int, g: int, b: int) -> bool:
+        return r_min <= r <= r_max and g_min <= g <= g_max and b_min <= b <= b_max
     
-    # Blue channel checks
-    if "b_min" in conditions:
-        checks.append(b >= conditions["b_min"])
-    if "b_max" in conditions:
-        checks.append(b <= conditions["b_max"])
-    
-    # All conditions must be True
-    return all(checks) if checks else False
+    return check
 
 def calculate_confidence(r: int, g: int, b: int, conditions: dict) -> float:
     """
@@ -79,9 +87,13 @@ def calculate_confidence(r: int, g: int, b: int, conditions: dict) -> float:
 
 def get_status_color(status: str) -> str:
     """Get hex color code for status visualization"""
-    colors = {
-        "fresh": "#4ade80",      # Green
-        "warning": "#fb923c",    # Orange
-        "rotten": "#ef4444"      # Red
+    return STATUS_COLORS.get(status, DEFAULT_STATUS_COLOR)
+
+# Detection rules compiled once at import: fruit type -> level -> (check, conditions)
+COMPILED_RULES = {
+    fruit_type: {
+        level: (compile_rgb_conditions(levels.get(level, {})), levels.get(level, {}))
+        for level in ("fresh", "warning")
     }
-    return colors.get(status, "#6b7280")  # Gray as default
+    for fruit_type, levels in config.DETECTION_RULES.items()
+}
@@ -4,11 +4,17 @@ FastAPI app with WebSocket support and MQTT integration
 """
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Set
-import json
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import asyncio
+import logging
+import orjson
+import threading
 
 import config
 import database
@@ -16,10 +22,17 @@ import detection
 import api
 from mqtt_client import SigmaMQTTClient
 
+# Per-message logs are DEBUG, so they cost nothing unless enabled
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("sigma")
+logger.setLevel(config.LOG_LEVEL)
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Set[WebSocket] = set()
+        # Close handshakes of dropped clients, referenced so they aren't collected
+        self._closing: Set[asyncio.Task] = set()
     
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
@@ -27,127 +40,288 @@ class ConnectionManager:
         print(f"🔌 WebSocket client connected. Total: {len(self.active_connections)}")
     
     def disconnect(self, websocket: WebSocket):
+        if websocket not in self.active_connections:
+            return
         self.active_connections.discard(websocket)
         print(f"🔌 WebSocket client disconnected. Total: {len(self.active_connections)}")
     
+    def drop(self, websocket: WebSocket):
+        """
+        Stop broadcasting to a failed or stalled client and close its socket
+        in the background, so the client sees onclose and reconnects
+        """
+        self.disconnect(websocket)
+        task = asyncio.create_task(self._close(websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+    
+    async def _close(self, websocket: WebSocket):
+        """Close a dropped client without letting a stuck socket block"""
+        try:
+            await asyncio.wait_for(websocket.close(code=1011), config.WS_SEND_TIMEOUT)
+        except Exception as e:
+            logger.debug("🔌 Closing dropped WebSocket failed: %r", e)
+    
     async def broadcast(self, message: dict):
-        """Broadcast message to all connected clients"""
+        """
+        Broadcast message to all connected clients
+        The message is encoded once and sent as a binary frame of UTF-8 JSON,
+        so clients must decode binary frames before parsing
+        """
         if not self.active_connections:
             return
         
-        message_json = json.dumps(message)
-        disconnected = set()
+        payload = orjson.dumps(message)
         
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message_json)
-            except Exception as e:
-                print(f"❌ Error sending to WebSocket: {e}")
-                disconnected.add(connection)
+        # Send to all clients concurrently; snapshot the set since
+        # clients may connect or disconnect while sends are in flight.
+        # The timeout keeps a client that stopped reading from stalling the rest
+        connections = list(self.active_connections)
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(connection.send_bytes(payload), config.WS_SEND_TIMEOUT)
+                for connection in connections
+            ),
+            return_exceptions=True
+        )
         
-        # Remove disconnected clients
-        for conn in disconnected:
-            self.disconnect(conn)
+        # Remove disconnected or stalled clients
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                logger.warning("❌ Error sending to WebSocket: %r", result)
+                self.drop(connection)
 
 # Global connection manager and MQTT client
 manager = ConnectionManager()
 mqtt_client = None
 
-def handle_mqtt_message(topic: str, data: dict):
+# MQTT messages waiting to be saved; appended by the MQTT thread,
+# drained by the ingest flusher task
+ingest_buffer: list[dict] = []
+ingest_lock = threading.Lock()
+
+# Event loop captured at startup, so the MQTT thread can wake the flusher
+event_loop: asyncio.AbstractEventLoop = None
+ingest_wakeup: asyncio.Event = None
+
+def handle_mqtt_message(topic: str, data: dict, received_at: datetime = None):
     """
     Handle incoming MQTT messages
-    Process sensor data, run detection, save to DB, and broadcast
+    Validate sensor data and queue it for the ingest flusher, which
+    runs detection, saves to DB, and broadcasts
+    
+    received_at is the single timestamp used for the reading, the fruit's
+    last_seen, and the broadcast
     """
     try:
-        print(f"🔄 Processing MQTT message from topic: {topic}")
+        logger.debug("🔄 Processing MQTT message from topic: %s", topic)
         
         # Extract data from payload
         fruit_id = data.get("fruitId")
-        fruit_type = data.get("fruitType", "unknown")
+        fruit_type = data.get("fruitType")
         color_sensor = data.get("colorSensor", {})
         temperature = data.get("temperature")
         humidity = data.get("humidity")
         
-        if not fruit_id or not color_sensor:
-            print("⚠️ Missing required fields in MQTT message")
+        if not isinstance(fruit_type, str):
+            fruit_type = "unknown"
+        
+        # Reject malformed values here, so one bad message cannot break
+        # detection or the database write for the rest of its batch
+        if not isinstance(color_sensor, dict):
+            color_sensor = {}
+        rgb = [color_sensor.get(channel, 0) for channel in ("r", "g", "b")]
+        if (
+            not fruit_id or not isinstance(fruit_id, str) or not color_sensor
+            or not all(_is_number(value) for value in rgb)
+            or not all(value is None or _is_number(value) for value in (temperature, humidity))
+        ):
+            logger.warning("⚠️ Missing required fields in MQTT message from topic: %s", topic)
             return
         
-        r = color_sensor.get("r", 0)
-        g = color_sensor.get("g", 0)
-        b = color_sensor.get("b", 0)
-        
-        # Run detection logic
-        status, confidence = detection.detect_freshness(fruit_type, r, g, b, temperature)
-        
-        print(f"🔍 Detection result for {fruit_id}: {status} (confidence: {confidence:.2f})")
-        
-        # Save to database
-        db = next(database.get_db())
-        
-        # Create sensor reading
-        reading = database.SensorReading(
-            fruit_id=fruit_id,
-            fruit_type=fruit_type,
-            r=r,
-            g=g,
-            b=b,
-            temperature=temperature,
-            humidity=humidity,
-            status=status,
-            timestamp=datetime.utcnow()
-        )
-        db.add(reading)
-        
-        # Update or create fruit record
-        fruit = db.query(database.Fruit).filter(database.Fruit.fruit_id == fruit_id).first()
-        if fruit:
-            fruit.current_status = status
-            fruit.last_seen = datetime.utcnow()
-        else:
-            fruit = database.Fruit(
-                fruit_id=fruit_id,
-                fruit_type=fruit_type,
-                current_status=status,
-                last_seen=datetime.utcnow()
-            )
-            db.add(fruit)
-        
-        # Log detection
-        log = database.DetectionLog(
-            fruit_id=fruit_id,
-            detection_time=datetime.utcnow(),
-            status=status,
-            confidence=confidence
+        r, g, b = (int(value) for value in rgb)
+        
+        # Queue the reading for batched detection and database write
+        with ingest_lock:
+            ingest_buffer.append({
+                "fruit_id": fruit_id,
+                "fruit_type": fruit_type,
+                "r": r,
+                "g": g,
+                "b": b,
+                "temperature": temperature,
+                "humidity": humidity,
+                "received_at": received_at or datetime.utcnow()
+            })
+            buffered = len(ingest_buffer)
+        
+        # Flush early once a full batch is waiting; asyncio objects must only
+        # be touched from the loop thread
+        if buffered == config.INGEST_BATCH_SIZE and event_loop is not None:
+            event_loop.call_soon_threadsafe(ingest_wakeup.set)
+        
+    except Exception:
+        logger.exception("❌ Error handling MQTT message")
+
+def _is_number(value) -> bool:
+    """Check for a JSON number (bool is an int subclass but not a reading)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def flush_ingest_buffer(db: Session) -> list[dict]:
+    """
+    Save all buffered MQTT messages in a single transaction, falling back
+    to one transaction per reading if the batch write fails
+    Returns the broadcast messages of the saved readings
+    """
+    with ingest_lock:
+        if not ingest_buffer:
+            return []
+        batch = ingest_buffer.copy()
+        ingest_buffer.clear()
+    
+    readings = []
+    fruit_updates = []
+    broadcasts = []
+    for item in batch:
+        fruit_id = item["fruit_id"]
+        received_at = item["received_at"]
+        
+        # Run detection logic; handle_mqtt_message already validated the inputs
+        status, confidence = detection.detect_freshness(
+            item["fruit_type"], item["r"], item["g"], item["b"], item["temperature"]
         )
-        db.add(log)
         
-        db.commit()
-        db.close()
+        logger.debug("🔍 Detection result for %s: %s (confidence: %.2f)", fruit_id, status, confidence)
+        
+        readings.append({
+            "fruit_id": fruit_id,
+            "fruit_type": item["fruit_type"],
+            "r": item["r"],
+            "g": item["g"],
+            "b": item["b"],
+            "temperature": item["temperature"],
+            "humidity": item["humidity"],
+            "status": status,
+            "confidence": confidence,
+            "timestamp": received_at
+        })
         
-        print(f"💾 Data saved to database")
+        fruit_updates.append({
+            "fruit_id": fruit_id,
+            "fruit_type": item["fruit_type"],
+            "current_status": status,
+            "last_seen": received_at
+        })
         
-        # Broadcast to WebSocket clients
-        broadcast_data = {
+        # Broadcast to WebSocket clients once the batch is saved
+        broadcasts.append({
             "type": "sensor_update",
             "fruit_id": fruit_id,
-            "fruit_type": fruit_type,
-            "r": r,
-            "g": g,
-            "b": b,
-            "temperature": temperature,
-            "humidity": humidity,
+            "fruit_type": item["fruit_type"],
+            "r": item["r"],
+            "g": item["g"],
+            "b": item["b"],
+            "temperature": item["temperature"],
+            "humidity": item["humidity"],
             "status": status,
             "confidence": confidence,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": received_at.isoformat()
+        })
+    
+    if not readings:
+        return []
+    
+    try:
+        _save_readings(db, readings, fruit_updates)
+        saved = broadcasts
+    except Exception:
+        # Retry one reading per transaction, so only the bad rows are lost
+        logger.exception("❌ Error saving MQTT batch, retrying per reading")
+        saved = []
+        for reading, fruit_values, broadcast_data in zip(readings, fruit_updates, broadcasts):
+            try:
+                _save_readings(db, [reading], [fruit_values])
+            except Exception:
+                logger.exception("❌ Error saving reading for %s, skipping", reading["fruit_id"])
+                continue
+            saved.append(broadcast_data)
+    
+    if saved:
+        # New data makes cached dashboard responses stale
+        api.clear_response_cache()
+    
+    logger.debug("💾 Saved %d reading(s) to database", len(saved))
+    return saved
+
+def _save_readings(db: Session, readings: list[dict], fruit_updates: list[dict]):
+    """
+    Insert sensor readings and upsert their fruits in one transaction
+    Core executemany inserts skip ORM unit-of-work overhead; the
+    transaction commits on exit and rolls back on error
+    """
+    latest = {values["fruit_id"]: values for values in fruit_updates}
+    fruit_upsert = sqlite_insert(database.Fruit.__table__)
+    fruit_upsert = fruit_upsert.on_conflict_do_update(
+        index_elements=["fruit_id"],
+        set_={
+            "fruit_type": fruit_upsert.excluded.fruit_type,
+            "current_status": fruit_upsert.excluded.current_status,
+            "last_seen": fruit_upsert.excluded.last_seen
         }
+    )
+    
+    with db.begin():
+        db.execute(insert(database.SensorReading.__table__), readings)
+        # Upsert fruit records, keeping the latest values per fruit
+        db.execute(fruit_upsert, list(latest.values()))
+
+async def run_ingest_flusher(db: Session, broadcast_queue: asyncio.Queue, stop: asyncio.Event):
+    """
+    Periodically save buffered MQTT messages and queue their broadcasts
+    Broadcasting happens in run_broadcaster, so slow WebSocket clients
+    never hold up database writes
+    
+    Exits once stop is set and the current flush has finished; the flush
+    runs in a worker thread that cancellation could not interrupt
+    """
+    while not stop.is_set():
+        # Wait for the flush interval, or less if a full batch is waiting
+        try:
+            await asyncio.wait_for(ingest_wakeup.wait(), config.INGEST_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        ingest_wakeup.clear()
         
-        # Schedule broadcast (must be done in async context)
-        asyncio.create_task(manager.broadcast(broadcast_data))
+        try:
+            broadcasts = await asyncio.to_thread(flush_ingest_buffer, db)
+        except Exception:
+            logger.exception("❌ Error saving MQTT batch")
+            continue
         
-    except Exception as e:
-        print(f"❌ Error handling MQTT message: {e}")
-        import traceback
-        traceback.print_exc()
+        for broadcast_data in broadcasts:
+            broadcast_queue.put_nowait(broadcast_data)
+
+async def run_broadcaster(broadcast_queue: asyncio.Queue):
+    """Send saved readings to WebSocket clients in arrival order"""
+    while True:
+        broadcast_data = await broadcast_queue.get()
+        try:
+            await manager.broadcast(broadcast_data)
+        except Exception:
+            logger.exception("❌ Error broadcasting sensor update")
+
+async def run_db_optimizer(stop: asyncio.Event):
+    """Periodically refresh SQLite planner statistics until stop is set"""
+    while True:
+        try:
+            await asyncio.wait_for(stop.wait(), config.DB_OPTIMIZE_INTERVAL)
+            return
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await asyncio.to_thread(database.optimize_db)
+        except Exception:
+            logger.exception("❌ Error optimizing database")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -159,6 +333,19 @@ async def lifespan(app: FastAPI):
     database.init_db()
     print("✅ Database initialized")
     
+    # Start batched ingest writer with its own long-lived session
+    global event_loop, ingest_wakeup
+    event_loop = asyncio.get_running_loop()
+    ingest_wakeup = asyncio.Event()
+    shutdown = asyncio.Event()
+    ingest_db = database.SessionLocal()
+    broadcast_queue = asyncio.Queue()
+    flusher_task = asyncio.create_task(run_ingest_flusher(ingest_db, broadcast_queue, shutdown))
+    broadcaster_task = asyncio.create_task(run_broadcaster(broadcast_queue))
+    
+    # Keep planner statistics current as tables grow
+    optimizer_task = asyncio.create_task(run_db_optimizer(shutdown))
+    
     # Start MQTT client
     global mqtt_client
     mqtt_client = SigmaMQTTClient(on_message_callback=handle_mqtt_message)
@@ -174,13 +361,35 @@ async def lifespan(app: FastAPI):
     print("🛑 Shutting down SIGMA Backend...")
     if mqtt_client:
         mqtt_client.stop()
+    
+    # Let the background loops finish any database work already running
+    # in worker threads before the session and engine are closed
+    shutdown.set()
+    ingest_wakeup.set()
+    await asyncio.gather(flusher_task, optimizer_task, return_exceptions=True)
+    
+    broadcaster_task.cancel()
+    try:
+        await broadcaster_task
+    except asyncio.CancelledError:
+        pass
+    
+    # Save anything still buffered
+    try:
+        flush_ingest_buffer(ingest_db)
+    finally:
+        ingest_db.close()
+    
+    # Closing pooled connections runs PRAGMA optimize on each
+    database.engine.dispose()
 
 # Create FastAPI app
 app = FastAPI(
     title="SIGMA API",
     description="Sistem Indeks Kelayakan dan Kematangan Pangan",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
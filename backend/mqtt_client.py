@@ -2,12 +2,15 @@
 SIGMA MQTT Client
 Subscribes to ESP32 sensor data and processes incoming messages
 """
-import json
+import logging
+import orjson
 import paho.mqtt.client as mqtt
 from datetime import datetime
 from typing import Callable
 import config
 
+logger = logging.getLogger("sigma.mqtt")
+
 class SigmaMQTTClient:
     def __init__(self, on_message_callback: Callable):
         """
@@ -15,7 +18,7 @@ class SigmaMQTTClient:
         
         Args:
             on_message_callback: Function to call when message received
-                                 Should accept (topic, payload_dict)
+                                 Should accept (topic, payload_dict, received_at)
         """
         self.client = mqtt.Client(client_id="sigma_backend")
         self.on_message_callback = on_message_callback
@@ -48,25 +51,24 @@ class SigmaMQTTClient:
         """
         try:
             topic = msg.topic
-            payload = msg.payload.decode('utf-8')
+            received_at = datetime.utcnow()
             
-            print(f"📨 Received message on topic: {topic}")
-            print(f"   Payload: {payload}")
+            logger.debug("📨 Received message on topic: %s, payload: %s", topic, msg.payload)
             
             # Parse JSON
-            data = json.loads(payload)
+            data = orjson.loads(msg.payload)
             
             # Add timestamp if not present
             if 'timestamp' not in data:
-                data['timestamp'] = datetime.utcnow().isoformat()
+                data['timestamp'] = received_at.isoformat()
             
             # Call the registered callback
-            self.on_message_callback(topic, data)
+            self.on_message_callback(topic, data, received_at)
             
-        except json.JSONDecodeError as e:
-            print(f"❌ Failed to parse JSON: {e}")
-        except Exception as e:
-            print(f"❌ Error processing message: {e}")
+        except orjson.JSONDecodeError as e:
+            logger.warning("❌ Failed to parse JSON on topic %s: %s", msg.topic, e)
+        except Exception:
+            logger.exception("❌ Error processing message")
     
     def connect(self):
         """Connect to MQTT broker"""
@@ -11,6 +11,7 @@ const WS_URL = 'ws://localhost:8000/ws';
 let websocket = null;
 let chart = null;
 let reconnectInterval = null;
+const textDecoder = new TextDecoder();
 
 // DOM elements
 const connectionStatus = document.getElementById('connectionStatus');
@@ -63,6 +64,8 @@ function connectWebSocket() {
     
     try {
         websocket = new WebSocket(WS_URL);
+        // Sensor updates arrive as binary (UTF-8 JSON) frames
+        websocket.binaryType = 'arraybuffer';
         
         websocket.onopen = () => {
             console.log('✅ WebSocket connected');
@@ -77,7 +80,8 @@ function connectWebSocket() {
         
         websocket.onmessage = (event) => {
             try {
-                const data = JSON.parse(event.data);
+                const text = typeof event.data === 'string' ? event.data : textDecoder.decode(event.data);
+                const data = JSON.parse(text);
                 console.log('📨 WebSocket message:', data);
                 handleWebSocketMessage(data);
             } catch (error) {